@@ -1,32 +1,177 @@
 import sys
 import os
+import math
+import csv
+import functools
 import threading
 import json
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QLabel, QLineEdit, QComboBox, QPushButton, QTextEdit, 
     QSpinBox, QDoubleSpinBox, QGroupBox, QProgressBar, QMessageBox,
-    QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QTabWidget,
+    QCheckBox, QTableView, QHeaderView, QTabWidget,
     QFileDialog, QListWidget, QAbstractItemView, QSplitter
 )
-from PyQt5.QtCore import Qt, pyqtSignal, QObject
+from PyQt5.QtCore import (
+    Qt, pyqtSignal, QObject, QAbstractTableModel, QModelIndex, QRunnable, QThreadPool, QTimer,
+    QSignalBlocker, QSettings
+)
 from PyQt5.QtGui import QColor
-from dotenv import load_dotenv
 
 # Import your existing logic
 from src.logic import get_arbitrage_opportunities, get_sports
 
+# Write buffer used when exporting results, so large exports go out in few writes
+EXPORT_BUFFER_SIZE = 1 << 20
+
+# Milliseconds to wait for background workers when the window closes, before exiting without them
+SHUTDOWN_TIMEOUT_MS = 500
+
+@functools.lru_cache(maxsize=None)
+def default_api_key():
+    """Return the API key from the environment, reading .env only if it is not already set."""
+    if "API_KEY" not in os.environ:
+        from dotenv import load_dotenv
+        load_dotenv()
+    return os.environ.get("API_KEY", "")
+
 class WorkerSignals(QObject):
     """Defines the signals available from the worker thread."""
     finished = pyqtSignal()
     error = pyqtSignal(str)
     result = pyqtSignal(list)
+    partial = pyqtSignal(list)
     progress = pyqtSignal(int)
     status = pyqtSignal(str)
     sports_loaded = pyqtSignal(list)
 
-class ArbitrageWorker(threading.Thread):
-    """Worker thread for running arbitrage calculations."""
+# Profit cell backgrounds, from white (no profit) to green (6%+ profit) in steps of 5
+PROFIT_COLORS = [QColor(255 - intensity, 255, 255 - intensity) for intensity in range(0, 151, 5)]
+
+class ArbTableModel(QAbstractTableModel):
+    """Table model that exposes the arbitrage opportunities to the results view."""
+    BASE_COLUMNS = ['Match', 'League', 'Hours to Start', 'Total Implied Odds', 'Profit %', 'Profit Amount']
+    # Formatters for the base columns, applied to the values from base_values()
+    BASE_FORMATS = (str, str, "{:.1f}".format, "{:.4f}".format, "{:.2f}%".format, "${:.2f}".format)
+    # Allocation key and formatter for the bookmaker, odds and stake columns of each outcome
+    OUTCOME_FIELDS = (('bookmaker', str), ('odd', "{:.2f}".format), ('amount', "${:.2f}".format))
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.opps = []
+        self.bankroll = 0
+        self.show_allocation = False
+        self.outcomes = []
+        self.columns = list(self.BASE_COLUMNS)
+        self.outcome_columns = []
+        self._base_text = {}  # Formatted base columns per row, filled as rows are displayed
+    
+    def set_opportunities(self, opps, bankroll, show_allocation, outcomes=None):
+        """
+        Replace the displayed opportunities and rebuild the column layout.
+        `outcomes` may be passed when the caller has already collected the outcome names.
+        """
+        self.beginResetModel()
+        self.opps = opps
+        self.bankroll = bankroll
+        self.show_allocation = show_allocation
+        
+        # Get all unique outcome names across all opportunities, sorted once per reset
+        self.outcomes = []
+        self.columns = list(self.BASE_COLUMNS)
+        if show_allocation:
+            if outcomes is None:
+                outcomes = {outcome for arb in opps for outcome in arb['best_outcome_odds']}
+            self.outcomes = sorted(outcomes)
+            for outcome in self.outcomes:
+                self.columns.extend([f"{outcome} Bookmaker", f"{outcome} Odds", f"{outcome} Stake"])
+        
+        # (outcome, key, formatter) for every column after the base columns, so cells need a single lookup
+        self.outcome_columns = [(outcome, key, fmt) for outcome in self.outcomes for key, fmt in self.OUTCOME_FIELDS]
+        self._base_text = {}
+        self.endResetModel()
+    
+    def append_opportunities(self, new_opps, bankroll, show_allocation):
+        """Insert opportunities at the end of the table, resetting only if the columns change."""
+        if not new_opps:
+            return
+        
+        new_outcomes = {outcome for arb in new_opps for outcome in arb['best_outcome_odds']}
+        if (bankroll, show_allocation) != (self.bankroll, self.show_allocation) or \
+                (show_allocation and not new_outcomes.issubset(self.outcomes)):
+            self.set_opportunities(self.opps + new_opps, bankroll, show_allocation)
+            return
+        
+        first = len(self.opps)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_opps) - 1)
+        self.opps.extend(new_opps)
+        self.endInsertRows()
+    
+    def clear(self):
+        self.set_opportunities([], self.bankroll, self.show_allocation)
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.opps)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section]
+        return super().headerData(section, orientation, role)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        
+        row = index.row()
+        col = index.column()
+        arb = self.opps[row]
+        
+        if role == Qt.DisplayRole:
+            if col < len(self.BASE_COLUMNS):
+                return self.base_text(row)[col]
+            return self.outcome_text(arb, col)
+        
+        if role == Qt.BackgroundRole and col == 4:
+            # Apply conditional formatting - higher profit = greener
+            profit_percentage = (1 - arb['total_implied_odds']) * 100
+            intensity = min(int(profit_percentage * 25), 150)  # Scale green intensity
+            return PROFIT_COLORS[max(intensity, 0) // 5]
+        
+        return None
+    
+    def base_values(self, arb):
+        """Values shown in the base columns, in column order."""
+        profit = 1 - arb['total_implied_odds']
+        return (
+            arb['match_name'],
+            arb['league'],
+            arb['hours_to_start'],
+            arb['total_implied_odds'],
+            profit * 100,
+            self.bankroll * profit
+        )
+    
+    def base_text(self, row):
+        """Formatted base columns of a row, computed the first time the row is displayed."""
+        text = self._base_text.get(row)
+        if text is None:
+            values = self.base_values(self.opps[row])
+            text = self._base_text[row] = tuple(fmt(value) for fmt, value in zip(self.BASE_FORMATS, values))
+        return text
+    
+    def outcome_text(self, arb, col):
+        """Format an outcome column (bookmaker, odds, stake) when showing allocation."""
+        outcome, key, fmt = self.outcome_columns[col - len(self.BASE_COLUMNS)]
+        alloc = arb.get('bankroll_allocations', {}).get(outcome)
+        if alloc is None:
+            return "N/A"
+        return fmt(alloc[key])
+
+class ArbitrageWorker(QRunnable):
+    """Runnable for running arbitrage calculations on the global thread pool."""
     def __init__(self, key, region, cutoff, selected_sports=None):
         super().__init__()
         self.key = key
@@ -34,7 +179,23 @@ class ArbitrageWorker(threading.Thread):
         self.cutoff = cutoff
         self.selected_sports = selected_sports
         self.signals = WorkerSignals()
-        self.daemon = True  # Make thread exit when main thread exits
+        self._cancelled = threading.Event()
+        self.setAutoDelete(True)
+    
+    def cancel(self):
+        """Request cancellation; the results of a cancelled search are discarded."""
+        self._cancelled.set()
+    
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+        
+    def report_progress(self, completed, total):
+        self.signals.progress.emit(int(completed * 100 / total))
+        self.signals.status.emit(f"Fetched odds for {completed}/{total} sports...")
+        
+    def report_partial(self, opportunities):
+        if not self.is_cancelled():
+            self.signals.partial.emit(opportunities)
         
     def run(self):
         try:
@@ -43,21 +204,25 @@ class ArbitrageWorker(threading.Thread):
                 key=self.key, 
                 region=self.region, 
                 cutoff=self.cutoff,
-                selected_sports=self.selected_sports
+                selected_sports=self.selected_sports,
+                progress_callback=self.report_progress,
+                cancel_event=self._cancelled,
+                partial_callback=self.report_partial
             )
-            self.signals.result.emit(opportunities)
+            if not self.is_cancelled():
+                self.signals.result.emit(opportunities)
         except Exception as e:
             self.signals.error.emit(str(e))
         finally:
             self.signals.finished.emit()
 
-class SportsLoaderWorker(threading.Thread):
-    """Worker thread for loading available sports."""
+class SportsLoaderWorker(QRunnable):
+    """Runnable for loading available sports on the global thread pool."""
     def __init__(self, key):
         super().__init__()
         self.key = key
         self.signals = WorkerSignals()
-        self.daemon = True
+        self.setAutoDelete(True)
         
     def run(self):
         try:
@@ -76,10 +241,6 @@ class ArbitrageFinderGUI(QMainWindow):
         self.setWindowTitle("Arbitrage Finder")
         self.setMinimumSize(1000, 700)
         
-        # Load API key from environment if available
-        load_dotenv()
-        default_api_key = os.environ.get("API_KEY", "")
-        
         # Main widget and layout
         main_widget = QWidget()
         main_layout = QVBoxLayout()
@@ -94,14 +255,14 @@ class ArbitrageFinderGUI(QMainWindow):
         # API Key input
         api_key_layout = QHBoxLayout()
         api_key_label = QLabel("API Key:")
-        self.api_key_input = QLineEdit(default_api_key)
+        self.api_key_input = QLineEdit()
         self.api_key_input.setPlaceholderText("Enter your API key from The Odds API")
-        load_sports_button = QPushButton("Load Sports")
-        load_sports_button.clicked.connect(self.load_available_sports)
+        self.load_sports_button = QPushButton("Load Sports")
+        self.load_sports_button.clicked.connect(self.load_available_sports)
         
         api_key_layout.addWidget(api_key_label)
         api_key_layout.addWidget(self.api_key_input, 1)
-        api_key_layout.addWidget(load_sports_button)
+        api_key_layout.addWidget(self.load_sports_button)
         input_layout.addLayout(api_key_layout)
         
         # Sports filter and region selection section
@@ -178,7 +339,12 @@ class ArbitrageFinderGUI(QMainWindow):
         self.export_button.clicked.connect(self.export_results)
         self.export_button.setEnabled(False)
         
+        self.cancel_button = QPushButton("Cancel Search")
+        self.cancel_button.clicked.connect(self.cancel_search)
+        self.cancel_button.setEnabled(False)
+        
         button_layout.addWidget(self.search_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(self.export_button)
         input_layout.addLayout(button_layout)
         
@@ -204,9 +370,9 @@ class ArbitrageFinderGUI(QMainWindow):
         self.tabs.addTab(self.results_text, "Text View")
         
         # Table view tab
-        self.results_table = QTableWidget()
-        self.results_table.setColumnCount(6)  # Initial columns, will be expanded with outcomes
-        self.results_table.setHorizontalHeaderLabels(['Match', 'League', 'Hours to Start', 'Total Implied Odds', 'Profit %', 'Profit Amount'])
+        self.results_model = ArbTableModel(self)  # Columns are expanded with outcomes
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
         self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.tabs.addTab(self.results_table, "Table View")
         
@@ -218,17 +384,86 @@ class ArbitrageFinderGUI(QMainWindow):
         # Initialize with empty sports list (will be populated on load)
         self.sports = []
         
+        # Most recent search, and whether it is still running
+        self.worker = None
+        self.searching = False
+        
+        # Load API key from environment if available, once the window is up
+        QTimer.singleShot(0, self.load_default_api_key)
+        
         # Disable search button until sports are loaded
         self.search_button.setEnabled(False)
         
+        # Restore the previous session's settings and sports list
+        self.settings = QSettings("arbfinder", "gui")
+        self.restore_settings()
+        
+    def closeEvent(self, event):
+        """
+        Save settings, cancel a running search and drop queued work. A cancelled search stops within a
+        fraction of a second, but a worker blocked on a request (e.g. loading the sports) cannot be
+        interrupted, so if one is still running after SHUTDOWN_TIMEOUT_MS the process exits without it.
+        """
+        self.save_settings()
+        if self.worker is not None:
+            self.worker.cancel()
+        pool = QThreadPool.globalInstance()
+        pool.clear()
+        super().closeEvent(event)
+        
+        # Qt would otherwise wait for the request at exit, keeping a process without a window alive
+        if not pool.waitForDone(SHUTDOWN_TIMEOUT_MS):
+            self.settings.sync()
+            os._exit(0)
+    
+    def restore_settings(self):
+        """Restore the inputs and the last loaded sports list, so a search can start without reloading."""
+        settings = self.settings
+        self.region_combo.setCurrentText(settings.value("region", self.region_combo.currentText()))
+        self.cutoff_spin.setValue(settings.value("cutoff", self.cutoff_spin.value(), type=float))
+        self.bankroll_input.setValue(settings.value("bankroll", self.bankroll_input.value(), type=float))
+        self.show_bankroll_alloc.setChecked(
+            settings.value("show_allocation", self.show_bankroll_alloc.isChecked(), type=bool)
+        )
+        self.select_all_sports.setChecked(
+            settings.value("select_all_sports", self.select_all_sports.isChecked(), type=bool)
+        )
+        
+        sports = settings.value("sports_cache", [], type=list)
+        if sports:
+            self.update_sports_list(sports, settings.value("selected_sports", [], type=list))
+            self.status_label.setText(f"Loaded {len(sports)} sports from the last session")
+        
+        # Cached sports are refreshed in the background once the API key is known
+        self.refresh_restored_sports = bool(sports)
+    
+    def save_settings(self):
+        settings = self.settings
+        settings.setValue("region", self.region_combo.currentText())
+        settings.setValue("cutoff", self.cutoff_spin.value())
+        settings.setValue("bankroll", self.bankroll_input.value())
+        settings.setValue("show_allocation", self.show_bankroll_alloc.isChecked())
+        settings.setValue("select_all_sports", self.select_all_sports.isChecked())
+        settings.setValue("sports_cache", list(self.sports))
+        settings.setValue("selected_sports", [item.text() for item in self.sports_list.selectedItems()])
+    
+    def load_default_api_key(self):
+        """Fill in the API key from the environment unless one was already entered."""
+        if not self.api_key_input.text():
+            self.api_key_input.setText(default_api_key())
+        
+        # Refresh the sports restored from the last session in the background
+        if self.refresh_restored_sports and self.api_key_input.text().strip():
+            self.load_available_sports()
+    
     def toggle_all_sports(self, state):
         """Select or deselect all sports in the list."""
-        for i in range(self.sports_list.count()):
-            item = self.sports_list.item(i)
+        # One bulk selection change instead of a signal per item
+        with QSignalBlocker(self.sports_list):
             if state == Qt.Checked:
-                item.setSelected(True)
+                self.sports_list.selectAll()
             else:
-                item.setSelected(False)
+                self.sports_list.clearSelection()
     
     def load_available_sports(self):
         """Load available sports using the API key."""
@@ -236,22 +471,28 @@ class ArbitrageFinderGUI(QMainWindow):
         if not api_key:
             QMessageBox.warning(self, "Missing API Key", "Please enter your API key from The Odds API.")
             return
+        if self.searching:
+            return
         
         # Show progress and update status
+        self.progress_bar.setRange(0, 0)  # Indeterminate progress
         self.progress_bar.setVisible(True)
         self.status_label.setText("Loading available sports...")
-        self.sports_list.clear()
         
-        # Load sports in a background thread
+        # Load sports on the background thread pool
         self.sports_loader = SportsLoaderWorker(api_key)
         self.sports_loader.signals.sports_loaded.connect(self.update_sports_list)
         self.sports_loader.signals.error.connect(self.handle_error)
-        self.sports_loader.signals.finished.connect(lambda: self.progress_bar.setVisible(False))
-        self.sports_loader.signals.status.connect(self.update_status)
-        self.sports_loader.start()
+        self.sports_loader.signals.finished.connect(self.sports_loading_finished)
+        self.sports_loader.signals.status.connect(self.update_sports_status)
+        QThreadPool.globalInstance().start(self.sports_loader)
     
-    def update_sports_list(self, sports):
-        """Update the sports list with available sports."""
+    def update_sports_list(self, sports, selected=None):
+        """Update the sports list with available sports, keeping the current (or given) selection."""
+        if selected is None:
+            selected = [item.text() for item in self.sports_list.selectedItems()]
+        selected = set(selected)
+        
         self.sports = sports
         self.sports_list.clear()
         
@@ -260,36 +501,64 @@ class ArbitrageFinderGUI(QMainWindow):
         
         # Select all sports by default
         if self.select_all_sports.isChecked():
+            self.sports_list.selectAll()
+        else:
             for i in range(self.sports_list.count()):
-                self.sports_list.item(i).setSelected(True)
+                item = self.sports_list.item(i)
+                item.setSelected(item.text() in selected)
         
-        self.search_button.setEnabled(True)
-        self.status_label.setText(f"Loaded {len(sports)} sports")
+        # A refresh that finishes mid-search must not re-enable searching or overwrite its status
+        if not self.searching:
+            self.search_button.setEnabled(True)
+            self.status_label.setText(f"Loaded {len(sports)} sports")
+    
+    def update_sports_status(self, message):
+        """Show the sports loader's status unless a search is reporting its own."""
+        if not self.searching:
+            self.status_label.setText(message)
+    
+    def sports_loading_finished(self):
+        if not self.searching:
+            self.progress_bar.setVisible(False)
         
     def calculate_bankroll_allocation(self, odds_dict, total_implied_odds, bankroll):
         """
         Calculate the optimal bankroll allocation for each outcome to ensure equal profit.
         Returns a dictionary with outcome names as keys and allocation percentages as values.
         """
-        allocations = {}
-        total_percentage = 0
-        
-        for outcome, (bookmaker, odd) in odds_dict.items():
-            # Calculate stake as percentage of bankroll
-            stake_percentage = (1 / odd) / total_implied_odds
-            allocations[outcome] = {
-                'percentage': stake_percentage * 100,  # Convert to percentage
-                'amount': bankroll * stake_percentage,
+        # Stake for each outcome as a fraction of the bankroll
+        stake_fractions = [(1 / odd) / total_implied_odds for _, odd in odds_dict.values()]
+        
+        allocations = {
+            outcome: {
+                'percentage': stake_fraction * 100,  # Convert to percentage
+                'amount': bankroll * stake_fraction,
                 'bookmaker': bookmaker,
                 'odd': odd
             }
-            total_percentage += stake_percentage * 100
+            for (outcome, (bookmaker, odd)), stake_fraction in zip(odds_dict.items(), stake_fractions)
+        }
             
-        # Verify total percentage is approximately 100%
-        if not (99.5 <= total_percentage <= 100.5):
-            print(f"Warning: Total allocation percentage is {total_percentage:.2f}%, not 100%")
+        # Verify total allocation is approximately 100%
+        total_fraction = sum(stake_fractions)
+        if not math.isclose(total_fraction, 1.0, abs_tol=0.005):
+            print(f"Warning: Total allocation percentage is {total_fraction * 100:.2f}%, not 100%")
             
         return allocations
+    
+    def get_bankroll_allocation(self, arb, bankroll):
+        """
+        Return the bankroll allocation stored on an opportunity, recalculating it only
+        when the bankroll has changed since it was last computed.
+        """
+        if arb.get('_alloc_key') != bankroll or 'bankroll_allocations' not in arb:
+            arb['bankroll_allocations'] = self.calculate_bankroll_allocation(
+                arb['best_outcome_odds'],
+                arb['total_implied_odds'],
+                bankroll
+            )
+            arb['_alloc_key'] = bankroll
+        return arb['bankroll_allocations']
         
     def find_opportunities(self):
         api_key = self.api_key_input.text().strip()
@@ -307,144 +576,112 @@ class ArbitrageFinderGUI(QMainWindow):
         cutoff = self.cutoff_spin.value() / 100
         
         # Disable search button and show progress
+        self.searching = True
         self.search_button.setEnabled(False)
+        self.load_sports_button.setEnabled(False)
         self.export_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setRange(0, 100)  # Advanced as each sport is fetched
+        self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
         self.status_label.setText("Searching for arbitrage opportunities...")
         
+        self.opportunities = []
         self.results_text.clear()
-        self.results_table.setRowCount(0)
+        self.results_model.clear()
         self.results_text.append(f"Searching for arbitrage opportunities in {len(selected_sports)} sports...\n")
         
-        # Run the search in a background thread
+        # Run the search on the background thread pool
         self.worker = ArbitrageWorker(api_key, region, cutoff, selected_sports)
         self.worker.signals.result.connect(self.display_results)
+        self.worker.signals.partial.connect(self.append_results)
         self.worker.signals.error.connect(self.handle_error)
         self.worker.signals.finished.connect(self.search_completed)
         self.worker.signals.status.connect(self.update_status)
-        self.worker.start()
+        self.worker.signals.progress.connect(self.progress_bar.setValue)
+        QThreadPool.globalInstance().start(self.worker)
+    
+    def cancel_search(self):
+        """Stop the running search; requests that have not been sent yet are skipped and partial results are cleared."""
+        if self.worker is not None:
+            self.worker.cancel()
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("Cancelling search...")
     
     def update_status(self, message):
         self.status_label.setText(message)
     
     def display_results(self, opportunities):
         self.opportunities = opportunities
-        self.results_text.clear()
-        
-        count = len(opportunities)
-        self.results_text.append(f"{count} arbitrage opportunities found\n")
         
         # Get bankroll amount
         bankroll = self.bankroll_input.value()
         show_allocation = self.show_bankroll_alloc.isChecked()
         
-        # Update text view
+        self.render_results(opportunities, bankroll, show_allocation)
+    
+    def render_results(self, opportunities, bankroll, show_allocation):
+        """Fill the text and table views in a single pass over the opportunities."""
+        # Collect the text view's lines and set them in one go, so the document is laid out once
+        count = len(opportunities)
+        lines = [f"{count} arbitrage opportunities found\n"]
+        
+        # Outcome names for the table columns, gathered in the same pass
+        outcomes = set()
+        
         for arb in opportunities:
-            self.results_text.append(f"🏆 {arb['match_name']} in {arb['league']}")
-            self.results_text.append(f"    Total implied odds: {arb['total_implied_odds']:.4f} with these odds:")
+            outcomes.update(arb['best_outcome_odds'])
+            
+            lines.append(f"🏆 {arb['match_name']} in {arb['league']}")
+            lines.append(f"    Total implied odds: {arb['total_implied_odds']:.4f} with these odds:")
             
             # Calculate bankroll allocation if checkbox is checked
             if show_allocation:
-                allocations = self.calculate_bankroll_allocation(
-                    arb['best_outcome_odds'], 
-                    arb['total_implied_odds'],
-                    bankroll
-                )
-                
-                # Store the allocations in the opportunity data for export
-                arb['bankroll_allocations'] = allocations
+                # Stored on the opportunity so the table and export can reuse it
+                allocations = self.get_bankroll_allocation(arb, bankroll)
                 
                 # Display odds with allocation information
                 for outcome, allocation in allocations.items():
-                    self.results_text.append(
+                    lines.append(
                         f"    • {outcome} with {allocation['bookmaker']} for {allocation['odd']:.2f} odds - "
                         f"Bet: ${allocation['amount']:.2f} ({allocation['percentage']:.2f}% of bankroll)"
                     )
             else:
                 # Display just the odds without allocation information
                 for key, value in arb['best_outcome_odds'].items():
-                    self.results_text.append(f"    • {key} with {value[0]} for {value[1]}")
+                    lines.append(f"    • {key} with {value[0]} for {value[1]}")
             
             # Calculate and show potential profit
             profit_percentage = (1 - arb['total_implied_odds']) * 100
-            self.results_text.append(f"    Potential profit: {profit_percentage:.2f}%\n")
+            lines.append(f"    Potential profit: {profit_percentage:.2f}%\n")
             
             if show_allocation:
                 # Calculate actual profit amount based on bankroll
                 profit_amount = bankroll * (1 - arb['total_implied_odds'])
-                self.results_text.append(f"    Profit amount: ${profit_amount:.2f} on ${bankroll:.2f} bankroll\n")
+                lines.append(f"    Profit amount: ${profit_amount:.2f} on ${bankroll:.2f} bankroll\n")
         
-        # Update table view
-        self.update_table_view(opportunities, bankroll, show_allocation)
-    
-    def update_table_view(self, opportunities, bankroll, show_allocation):
-        if not opportunities:
-            return
-            
-        # Get all unique outcome names across all opportunities
-        all_outcomes = set()
-        for arb in opportunities:
-            for outcome in arb['best_outcome_odds'].keys():
-                all_outcomes.add(outcome)
+        self.results_text.setPlainText("\n".join(lines))
         
-        # Set up the table columns
-        base_columns = ['Match', 'League', 'Hours to Start', 'Total Implied Odds', 'Profit %', 'Profit Amount']
-        outcome_columns = []
+        # The view only renders the visible rows, so the table is a single model reset
+        self.results_model.set_opportunities(opportunities, bankroll, show_allocation, outcomes)
+    
+    def append_results(self, new_opportunities):
+        """Add the opportunities of a finished sport to the table while the search is still running."""
+        bankroll = self.bankroll_input.value()
+        show_allocation = self.show_bankroll_alloc.isChecked()
+        model = self.results_model
         
         if show_allocation:
-            for outcome in sorted(all_outcomes):
-                outcome_columns.extend([f"{outcome} Bookmaker", f"{outcome} Odds", f"{outcome} Stake"])
-        
-        all_columns = base_columns + outcome_columns
-        self.results_table.setColumnCount(len(all_columns))
-        self.results_table.setHorizontalHeaderLabels(all_columns)
-        
-        # Populate the table
-        self.results_table.setRowCount(len(opportunities))
+            # If the bankroll or allocation setting changed mid-search the whole table is redrawn,
+            # so the rows already shown need stakes for the new bankroll as well
+            if (bankroll, show_allocation) != (model.bankroll, model.show_allocation):
+                rows = model.opps + new_opportunities
+            else:
+                rows = new_opportunities
+            for arb in rows:
+                self.get_bankroll_allocation(arb, bankroll)
         
-        for row_idx, arb in enumerate(opportunities):
-            # Calculate profit percentage and amount
-            profit_percentage = (1 - arb['total_implied_odds']) * 100
-            profit_amount = bankroll * (1 - arb['total_implied_odds'])
-            
-            # Base columns
-            self.results_table.setItem(row_idx, 0, QTableWidgetItem(arb['match_name']))
-            self.results_table.setItem(row_idx, 1, QTableWidgetItem(arb['league']))
-            self.results_table.setItem(row_idx, 2, QTableWidgetItem(f"{arb['hours_to_start']:.1f}"))
-            self.results_table.setItem(row_idx, 3, QTableWidgetItem(f"{arb['total_implied_odds']:.4f}"))
-            self.results_table.setItem(row_idx, 4, QTableWidgetItem(f"{profit_percentage:.2f}%"))
-            self.results_table.setItem(row_idx, 5, QTableWidgetItem(f"${profit_amount:.2f}"))
-            
-            # Apply conditional formatting - higher profit = greener
-            profit_item = self.results_table.item(row_idx, 4)
-            intensity = min(int(profit_percentage * 25), 150)  # Scale green intensity
-            profit_item.setBackground(QColor(255 - intensity, 255, 255 - intensity))
-            
-            # Outcome columns if showing allocation
-            if show_allocation:
-                allocations = self.calculate_bankroll_allocation(
-                    arb['best_outcome_odds'],
-                    arb['total_implied_odds'],
-                    bankroll
-                )
-                
-                col_offset = len(base_columns)
-                for outcome_idx, outcome in enumerate(sorted(all_outcomes)):
-                    if outcome in allocations:
-                        alloc = allocations[outcome]
-                        self.results_table.setItem(row_idx, col_offset + outcome_idx*3, 
-                                                 QTableWidgetItem(alloc['bookmaker']))
-                        self.results_table.setItem(row_idx, col_offset + outcome_idx*3 + 1, 
-                                                 QTableWidgetItem(f"{alloc['odd']:.2f}"))
-                        self.results_table.setItem(row_idx, col_offset + outcome_idx*3 + 2, 
-                                                 QTableWidgetItem(f"${alloc['amount']:.2f}"))
-                    else:
-                        self.results_table.setItem(row_idx, col_offset + outcome_idx*3, QTableWidgetItem("N/A"))
-                        self.results_table.setItem(row_idx, col_offset + outcome_idx*3 + 1, QTableWidgetItem("N/A"))
-                        self.results_table.setItem(row_idx, col_offset + outcome_idx*3 + 2, QTableWidgetItem("N/A"))
-        
-        # Adjust column widths
-        self.results_table.resizeColumnsToContents()
+        model.append_opportunities(new_opportunities, bankroll, show_allocation)
     
     def handle_error(self, error_msg):
         self.results_text.clear()
@@ -453,15 +690,96 @@ class ArbitrageFinderGUI(QMainWindow):
         QMessageBox.critical(self, "Error", f"An error occurred: {error_msg}")
     
     def search_completed(self):
+        cancelled = self.worker is not None and self.worker.is_cancelled()
+        if cancelled:
+            # Discard the rows shown while the search was running, like the rest of its results
+            self.opportunities = []
+            self.results_model.clear()
+            self.results_text.setPlainText("Search cancelled.")
+        
+        self.searching = False
         self.search_button.setEnabled(True)
+        self.load_sports_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
         self.progress_bar.setVisible(False)
         self.export_button.setEnabled(len(self.opportunities) > 0)
         
-        if self.opportunities:
+        if cancelled:
+            self.status_label.setText("Search cancelled.")
+        elif self.opportunities:
             self.status_label.setText(f"Found {len(self.opportunities)} arbitrage opportunities.")
         else:
             self.status_label.setText("No arbitrage opportunities found.")
     
+    def export_allocations(self, bankroll):
+        """
+        Return the bankroll allocation of every opportunity for the exported bankroll. Stored allocations
+        are reused when they match it, but new ones are not stored, so the views keep the bankroll they show.
+        """
+        allocations = []
+        for arb in self.opportunities:
+            if arb.get('_alloc_key') == bankroll and 'bankroll_allocations' in arb:
+                allocations.append(arb['bankroll_allocations'])
+            else:
+                allocations.append(self.calculate_bankroll_allocation(
+                    arb['best_outcome_odds'],
+                    arb['total_implied_odds'],
+                    bankroll
+                ))
+        return allocations
+    
+    def exportable_opportunities(self, allocations=None):
+        """
+        Return the opportunities without internal bookkeeping keys (e.g. the allocation cache key),
+        with the given per-opportunity allocations in place of the stored ones.
+        """
+        opportunities = [{k: v for k, v in arb.items() if not k.startswith('_')} for arb in self.opportunities]
+        if allocations is not None:
+            for arb, allocation in zip(opportunities, allocations):
+                arb['bankroll_allocations'] = allocation
+        return opportunities
+    
+    def csv_rows(self, allocations=None):
+        """Yield the CSV header followed by one row per opportunity, with allocation columns if given."""
+        header = ['Match', 'League', 'Hours to Start', 'Total Implied Odds', 'Profit %']
+        
+        # Outcome columns are shared by every row, in order of first appearance
+        outcomes = []
+        if allocations is not None:
+            outcomes = list(dict.fromkeys(
+                outcome for arb in self.opportunities for outcome in arb['best_outcome_odds']
+            ))
+            for outcome in outcomes:
+                header.extend([f"{outcome} Bookmaker", f"{outcome} Odds", f"{outcome} Stake %", f"{outcome} Stake $"])
+        
+        yield header
+        
+        missing = ["N/A", "N/A", "N/A", "N/A"]
+        for i, arb in enumerate(self.opportunities):
+            profit = (1 - arb['total_implied_odds']) * 100
+            row = [
+                arb['match_name'],
+                arb['league'],
+                f"{arb['hours_to_start']:.1f}",
+                f"{arb['total_implied_odds']:.4f}",
+                f"{profit:.2f}%"
+            ]
+            
+            # Add allocation data if showing allocations
+            for outcome in outcomes:
+                alloc = allocations[i].get(outcome)
+                if alloc is None:
+                    row += missing
+                else:
+                    row += [
+                        alloc['bookmaker'],
+                        f"{alloc['odd']:.2f}",
+                        f"{alloc['percentage']:.2f}%",
+                        f"${alloc['amount']:.2f}"
+                    ]
+            
+            yield row
+    
     def export_results(self):
         if not self.opportunities:
             return
@@ -474,18 +792,10 @@ class ArbitrageFinderGUI(QMainWindow):
             return
             
         try:
-            show_allocation = self.show_bankroll_alloc.isChecked()
-            bankroll = self.bankroll_input.value()
-            
-            # For export, ensure we calculate allocations if they don't exist yet
-            if show_allocation:
-                for arb in self.opportunities:
-                    if 'bankroll_allocations' not in arb:
-                        arb['bankroll_allocations'] = self.calculate_bankroll_allocation(
-                            arb['best_outcome_odds'],
-                            arb['total_implied_odds'],
-                            bankroll
-                        )
+            # Export the allocations for the current bankroll, even if the views still show an older one
+            allocations = None
+            if self.show_bankroll_alloc.isChecked():
+                allocations = self.export_allocations(self.bankroll_input.value())
             
             # Add file extension if not present
             if "json" in filter_used and not file_path.lower().endswith('.json'):
@@ -493,57 +803,13 @@ class ArbitrageFinderGUI(QMainWindow):
             elif "csv" in filter_used and not file_path.lower().endswith('.csv'):
                 file_path += '.csv'
             
-            if file_path.endswith('.json'):
-                with open(file_path, 'w') as f:
-                    json.dump(self.opportunities, f, indent=2)
-            elif file_path.endswith('.csv'):
-                import csv
-                with open(file_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    
-                    # Write header
-                    header = ['Match', 'League', 'Hours to Start', 'Total Implied Odds', 'Profit %']
-                    
-                    # Add allocation columns if showing allocations
-                    if show_allocation:
-                        # We need to get the outcome names from the first opportunity to create headers
-                        if self.opportunities:
-                            first_arb = self.opportunities[0]
-                            for outcome in first_arb['best_outcome_odds'].keys():
-                                header.extend([f"{outcome} Bookmaker", f"{outcome} Odds", f"{outcome} Stake %", f"{outcome} Stake $"])
-                    
-                    writer.writerow(header)
-                    
-                    # Write data
-                    for arb in self.opportunities:
-                        profit = (1 - arb['total_implied_odds']) * 100
-                        row = [
-                            arb['match_name'],
-                            arb['league'],
-                            f"{arb['hours_to_start']:.1f}",
-                            f"{arb['total_implied_odds']:.4f}",
-                            f"{profit:.2f}%"
-                        ]
-                        
-                        # Add allocation data if showing allocations
-                        if show_allocation and 'bankroll_allocations' in arb:
-                            for outcome in arb['best_outcome_odds'].keys():
-                                if outcome in arb['bankroll_allocations']:
-                                    alloc = arb['bankroll_allocations'][outcome]
-                                    row.extend([
-                                        alloc['bookmaker'],
-                                        f"{alloc['odd']:.2f}",
-                                        f"{alloc['percentage']:.2f}%",
-                                        f"${alloc['amount']:.2f}"
-                                    ])
-                                else:
-                                    row.extend(["N/A", "N/A", "N/A", "N/A"])
-                        
-                        writer.writerow(row)
+            if file_path.endswith('.csv'):
+                with open(file_path, 'w', newline='', buffering=EXPORT_BUFFER_SIZE) as f:
+                    csv.writer(f).writerows(self.csv_rows(allocations))
             else:
                 # Default to JSON if no recognized extension
-                with open(file_path, 'w') as f:
-                    json.dump(self.opportunities, f, indent=2)
+                with open(file_path, 'w', buffering=EXPORT_BUFFER_SIZE) as f:
+                    json.dump(self.exportable_opportunities(allocations), f, separators=(',', ':'))
                     
             QMessageBox.information(self, "Export Successful", f"Results successfully exported to {file_path}")
         except Exception as e:
@@ -1,17 +1,59 @@
-from typing import Iterable, Generator, List
+from typing import Iterable, Iterator, Generator, List
+from bisect import bisect_right
+from collections import defaultdict
+from operator import itemgetter
+import heapq
+import queue
+import re
+import sys
 import time
+import threading
 import requests
-from itertools import chain
-import concurrent.futures
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
 
 try:
     from tqdm import tqdm
 except ImportError:
     tqdm = lambda *args, **kwargs: args[0]
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 BASE_URL = "api.the-odds-api.com/v4"
 PROTOCOL = "https://"
 
+# Seconds to wait for the API before giving up on a request
+REQUEST_TIMEOUT = 30
+
+# Filter for sports that are likely to have more opportunities
+# You can customize this list based on your preferences
+POPULAR_SPORTS = ("soccer", "basketball", "baseball", "football", "tennis", "hockey")
+# Matches a sport key containing any of the above (e.g. "americanfootball_nfl", "icehockey_nhl")
+_POPULAR_SPORTS_PATTERN = re.compile("|".join(map(re.escape, POPULAR_SPORTS)), re.IGNORECASE)
+
+# Upper bound on concurrent sport fetches; the connection pool holds as many connections
+MAX_FETCH_WORKERS = 32
+
+# Seconds between checks for a cancelled search while waiting on the sport fetches
+CANCEL_POLL_INTERVAL = 0.1
+
+# Requests per second sent to the API across all fetch workers, and how many may be sent in a burst
+MAX_REQUESTS_PER_SECOND = 10
+MAX_REQUEST_BURST = 10
+
+# Retries of a rate-limited (429) request. They wait 1s, 2s, 4s, ... or the Retry-After the API sends
+# when that is longer, but never more than RATE_LIMIT_MAX_WAIT seconds
+RATE_LIMIT_RETRIES = 4
+RATE_LIMIT_MAX_WAIT = 30
+
+# How long API responses are reused before they are requested again (in seconds)
+SPORTS_CACHE_TTL = 3600
+ODDS_CACHE_TTL = 30
+
 
 class APIException(RuntimeError):
     def __str__(self):
@@ -26,6 +68,100 @@ class RateLimitException(APIException):
     pass
 
 
+class TTLCache:
+    """
+    Small thread-safe cache whose entries expire `ttl` seconds after they were stored.
+    Expired entries are kept (until evicted by size) so they can be revalidated with the API.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at >= self.ttl:
+                return None
+            return value
+
+    def get_stale(self, key):
+        """Returns the cached value for `key` even if it has expired, or None if it is missing."""
+        with self._lock:
+            entry = self._data.get(key)
+            return None if entry is None else entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic(), value)
+            # Evict the oldest entries once the cache is full
+            while len(self._data) > self.maxsize:
+                del self._data[next(iter(self._data))]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RateLimiter:
+    """Thread-safe token bucket, so concurrent fetches stay under the API's request frequency limit."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_rate_limiter = RateLimiter(MAX_REQUESTS_PER_SECOND, MAX_REQUEST_BURST)
+_sports_cache = TTLCache(ttl=SPORTS_CACHE_TTL, maxsize=8)
+_odds_cache = TTLCache(ttl=ODDS_CACHE_TTL, maxsize=256)
+
+
+def _create_session() -> requests.Session:
+    """Creates the session shared by all API requests, so connections to the API are pooled and reused."""
+    session = requests.Session()
+    # Server errors are retried right away, then after 2s and 4s (urllib3 does not wait before the first retry).
+    # Connection failures and timeouts are retried only once, since each attempt may take REQUEST_TIMEOUT.
+    # Rate-limited requests are retried by _get_json instead, so the waits are capped and go through the rate limiter
+    retries = Retry(
+        total=3,
+        connect=1,
+        read=1,
+        backoff_factor=1,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=False,
+        raise_on_status=False,  # Hand the last response to handle_faulty_response
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=MAX_FETCH_WORKERS, max_retries=retries))
+    return session
+
+
+_SESSION = _create_session()
+
+
 def handle_faulty_response(response: requests.Response):
     if response.status_code == 401:
         raise AuthenticationException("Failed to authenticate with the API. Is the API key valid?", response)
@@ -35,35 +171,70 @@ def handle_faulty_response(response: requests.Response):
         raise APIException(f"Unknown issue arose while trying to access the API (Status code: {response.status_code}).", response)
 
 
-def get_sports(key: str) -> List[str]:
-    url = f"{BASE_URL}/sports/"
-    escaped_url = PROTOCOL + requests.utils.quote(url)
-    querystring = {"apiKey": key}
+def _rate_limit_wait(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a rate-limited request for the given (zero-based) attempt."""
+    wait = 2 ** attempt
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            wait = max(wait, Retry.DEFAULT.parse_retry_after(retry_after))
+        except InvalidHeader:
+            pass
+    return min(wait, RATE_LIMIT_MAX_WAIT)
+
 
-    response = requests.get(escaped_url, params=querystring)
+def _get_json(url: str, params: dict, cache: TTLCache, cache_key):
+    """
+    Requests `url` and returns the decoded JSON, reusing the cached response while it is fresh.
+    Once it has expired, it is revalidated with its ETag so an unchanged response is not downloaded again.
+    """
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached[1]
+
+    headers = {}
+    stale = cache.get_stale(cache_key)
+    if stale is not None and stale[0]:
+        headers["If-None-Match"] = stale[0]
+
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        _rate_limiter.acquire()
+        response = _SESSION.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+            break
+        time.sleep(_rate_limit_wait(response, attempt))
+
+    if response.status_code == 304 and stale is not None:
+        cache.set(cache_key, stale)
+        return stale[1]
     if not response.ok:
         handle_faulty_response(response)
 
-    # Filter for sports that are likely to have more opportunities
-    # You can customize this list based on your preferences
-    popular_sports = ["soccer", "basketball", "baseball", "football", "tennis", "hockey"]
-    
+    # Decode the raw body directly; orjson is much faster than the stdlib parser on large odds payloads
+    data = json_loads(response.content)
+    cache.set(cache_key, (response.headers.get("ETag"), data))
+    return data
+
+
+def get_sports(key: str) -> List[str]:
+    url = f"{PROTOCOL}{BASE_URL}/sports/"
+    querystring = {"apiKey": key}
+
     sports = []
-    for item in response.json():
+    for item in _get_json(url, querystring, _sports_cache, key):
         # Skip sports that only have outrights (not suitable for arbitrage)
         if item.get("has_outrights") == True and not item.get("active", False):
             continue
             
         # Filter for popular sports to reduce API calls
-        if any(pop in item["key"].lower() for pop in popular_sports):
+        if _POPULAR_SPORTS_PATTERN.search(item["key"]):
             sports.append(item["key"])
     
     return sports
 
 
 def get_data(key: str, sport: str, region: str = "eu"):
-    url = f"{BASE_URL}/sports/{sport}/odds/"
-    escaped_url = PROTOCOL + requests.utils.quote(url)
+    url = f"{PROTOCOL}{BASE_URL}/sports/{sport}/odds/"
     querystring = {
         "apiKey": key,
         "regions": region,
@@ -71,11 +242,7 @@ def get_data(key: str, sport: str, region: str = "eu"):
         "dateFormat": "unix"
     }
 
-    response = requests.get(escaped_url, params=querystring)
-    if not response.ok:
-        handle_faulty_response(response)
-
-    return response.json()
+    return _get_json(url, querystring, _odds_cache, (key, sport, region))
 
 
 def fetch_sport_data(args):
@@ -87,21 +254,53 @@ def fetch_sport_data(args):
         return []
 
 
+def _viable_combinations(options: List[list], max_total: float):
+    """
+    Yields every pick of one (bookmaker, odd) per outcome whose total implied odds may be at most
+    `max_total`, together with that total. Each outcome's options must be sorted from best to worst odds.
+    A branch is cut as soon as its running total plus the best possible remainder exceeds `max_total`.
+    """
+    inverse = [[1/odd for _, odd in outcome] for outcome in options]
+    
+    # remaining[i] is the smallest possible sum of implied odds over outcomes i and later
+    remaining = [0.0] * (len(inverse) + 1)
+    for i in range(len(inverse) - 1, -1, -1):
+        remaining[i] = remaining[i + 1] + min(inverse[i])
+    
+    limit = max_total + 1e-9  # Don't let rounding prune a combination that passes the exact check
+    picks = [None] * len(options)
+    last = len(options) - 1
+    
+    def walk(i, partial):
+        # Options are sorted, so the viable ones are a prefix found with a single binary search
+        viable = bisect_right(inverse[i], limit - remaining[i + 1] - partial)
+        if i == last:
+            # Emit complete combinations here rather than through another generator level
+            for option, inv in zip(options[i][:viable], inverse[i]):
+                picks[i] = option
+                yield tuple(picks), partial + inv
+            return
+        for option, inv in zip(options[i][:viable], inverse[i]):
+            picks[i] = option
+            yield from walk(i + 1, partial + inv)
+    
+    yield from walk(0, 0)
+
+
 def process_data(matches: Iterable, include_started_matches: bool = True, cutoff: float = 0) -> Generator[dict, None, None]:
     """Extracts all matches and finds all viable bookmaker combinations for arbitrage."""
-    matches = tqdm(matches, desc="Checking all matches", leave=False, unit=" matches")
-    
     for match in matches:
+        now = time.time()
         start_time = int(match["commence_time"])
-        if not include_started_matches and start_time < time.time():
+        if not include_started_matches and start_time < now:
             continue
             
         match_name = f"{match['home_team']} v. {match['away_team']}"
-        time_to_start = (start_time - time.time())/3600
+        time_to_start = (start_time - now)/3600
         league = match["sport_key"]
         
         # Get all bookmakers' odds for each outcome
-        outcomes_data = {}
+        outcomes_data = defaultdict(list)
         
         for bookmaker in match["bookmakers"]:
             bookie_name = bookmaker["title"]
@@ -113,17 +312,7 @@ def process_data(matches: Iterable, include_started_matches: bool = True, cutoff
             market = bookmaker["markets"][0]  # Moneyline market
             
             for outcome in market["outcomes"]:
-                outcome_name = outcome["name"]
-                odd = outcome["price"]
-                
-                if outcome_name not in outcomes_data:
-                    outcomes_data[outcome_name] = []
-                
-                outcomes_data[outcome_name].append((bookie_name, odd))
-        
-        # Sort each outcome's odds from best to worst
-        for outcome_name in outcomes_data:
-            outcomes_data[outcome_name].sort(key=lambda x: x[1], reverse=True)
+                outcomes_data[outcome["name"]].append((bookie_name, outcome["price"]))
         
         # Skip if we don't have enough outcomes
         outcome_names = list(outcomes_data.keys())
@@ -131,35 +320,30 @@ def process_data(matches: Iterable, include_started_matches: bool = True, cutoff
             continue  # Need at least 2 outcomes for an arbitrage opportunity
         
         # Quick check: Is arbitrage possible with the best odds?
-        best_odds = {name: outcomes_data[name][0][1] for name in outcome_names if outcomes_data[name]}
-        total_implied_odds = sum(1/odd for odd in best_odds.values())
+        best_total_implied_odds = sum(1/max(outcomes_data[name], key=itemgetter(1))[1] for name in outcome_names)
         
         # Skip if no arbitrage is possible even with best odds
-        if total_implied_odds >= 1:
+        if best_total_implied_odds >= 1:
             continue
-            
-        # If we have more than 3 outcomes, limit combinations to improve performance
+        
+        # Only matches that pass the quick check need their odds ordered from best to worst
         if len(outcome_names) > 3:
-            # Use only top 2 bookmakers for each outcome to limit combinations
+            # If we have more than 3 outcomes, use only the top 2 bookmakers for each outcome to limit combinations
             for outcome in outcomes_data:
-                if len(outcomes_data[outcome]) > 2:
-                    outcomes_data[outcome] = outcomes_data[outcome][:2]
-        
-        # Generate viable bookmaker combinations
-        from itertools import product
+                outcomes_data[outcome] = heapq.nlargest(2, outcomes_data[outcome], key=itemgetter(1))
+        else:
+            for outcome_name in outcomes_data:
+                outcomes_data[outcome_name].sort(key=itemgetter(1), reverse=True)
         
         # Generate possible combinations of bookmakers
         bookmaker_options = [outcomes_data[outcome] for outcome in outcome_names]
         
-        for combination in product(*bookmaker_options):
-            # Create a dict of best odds for this combination
-            best_odds = {outcome_names[i]: combination[i] for i in range(len(outcome_names))}
-            
-            # Calculate implied odds
-            total_implied_odds = sum(1/odd[1] for odd in best_odds.values())
-            
+        # Only combinations that can still reach the cutoff are generated
+        for combination, total_implied_odds in _viable_combinations(bookmaker_options, 1 - cutoff):
             # Check if this is an arbitrage opportunity that meets our cutoff
             if total_implied_odds < 1 and total_implied_odds > 0 and (1 - total_implied_odds) >= cutoff:
+                # Create a dict of best odds for this combination
+                best_odds = dict(zip(outcome_names, combination))
                 yield {
                     "match_name": match_name,
                     "match_start_time": start_time,
@@ -170,18 +354,65 @@ def process_data(matches: Iterable, include_started_matches: bool = True, cutoff
                 }
 
 
-def get_arbitrage_opportunities(key: str, region: str, cutoff: float = 0, selected_sports=None):
+def _fetch_sports(key: str, sports: List[str], region: str, cancel_event=None) -> Iterator[list]:
     """
-    Find arbitrage opportunities across sports betting markets.
+    Fetches the data of every sport on daemon worker threads and yields it in order of arrival.
+    Stops waiting as soon as `cancel_event` is set or the generator is closed, and skips the sports
+    that have not been requested yet. Requests already in flight cannot be interrupted, but being on
+    daemon threads they don't keep the process from exiting.
+    """
+    pending = queue.SimpleQueue()
+    for sport in sports:
+        pending.put(sport)
+    results = queue.SimpleQueue()
+    stopped = threading.Event()
+
+    def fetch_pending():
+        while not stopped.is_set():
+            try:
+                sport = pending.get_nowait()
+            except queue.Empty:
+                return
+            results.put(fetch_sport_data((key, sport, region)))
+
+    # One worker per sport (up to the pool size), since the fetches only wait on the network
+    for _ in range(max(1, min(MAX_FETCH_WORKERS, len(sports)))):
+        threading.Thread(target=fetch_pending, daemon=True).start()
+
+    try:
+        received = 0
+        while received < len(sports):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            try:
+                data = results.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            received += 1
+            yield data
+    finally:
+        stopped.set()
+
+
+def iter_arbitrage_opportunities(key: str, region: str, cutoff: float = 0, selected_sports=None,
+                                 progress_callback=None, cancel_event=None) -> Iterator[dict]:
+    """
+    Find arbitrage opportunities across sports betting markets, yielding them as each sport is processed.
     
     Args:
         key (str): API key for The Odds API
         region (str): Region code (e.g., "us", "eu", "uk", "au")
         cutoff (float): Minimum profit margin (0.01 = 1%)
         selected_sports (list, optional): List of sports to filter results. If None, all available sports are used.
+        progress_callback (callable, optional): Called as progress_callback(completed, total) once all
+            opportunities of a sport have been yielded.
+        cancel_event (threading.Event, optional): When set, the generator stops within CANCEL_POLL_INTERVAL
+            seconds without yielding further opportunities, and sports that have not been requested yet are skipped.
+            Requests already in flight cannot be interrupted; they finish on daemon threads in the background,
+            without holding up the process's exit, and their results are discarded.
     
-    Returns:
-        list: List of arbitrage opportunities that meet the criteria
+    Yields:
+        dict: Arbitrage opportunities that meet the criteria
     """
     # Get available sports
     if selected_sports is None or len(selected_sports) == 0:
@@ -189,19 +420,57 @@ def get_arbitrage_opportunities(key: str, region: str, cutoff: float = 0, select
     else:
         sports = selected_sports
     
-    # Fetch data for each sport in parallel
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        args = [(key, sport, region) for sport in sports]
-        results = list(executor.map(fetch_sport_data, args))
+    # Fetch data for each sport in parallel and process each one as soon as it arrives
+    fetched = _fetch_sports(key, sports, region, cancel_event)
+    try:
+        # Progress is shown per sport, and only on a terminal (stderr is None in the windowed build)
+        finished = tqdm(fetched, total=len(sports), desc="Checking sports",
+                        leave=False, unit=" sports", disable=sys.stderr is None or not sys.stderr.isatty())
+        for completed, sport_data in enumerate(finished, start=1):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            
+            # Filter out any message objects
+            data = filter(lambda x: isinstance(x, dict) and "message" not in x, sport_data)
+            
+            # Process the data with our cutoff incorporated directly
+            yield from process_data(data, cutoff=cutoff)
+            
+            if progress_callback is not None:
+                progress_callback(completed, len(sports))
+    finally:
+        # Skip the sports that have not been requested yet
+        fetched.close()
+
+
+def get_arbitrage_opportunities(key: str, region: str, cutoff: float = 0, selected_sports=None, progress_callback=None,
+                                cancel_event=None, partial_callback=None) -> List[dict]:
+    """
+    Collects the opportunities from iter_arbitrage_opportunities into a list.
     
-    # Flatten the list of match data
-    data = chain.from_iterable(results)
+    Takes the same arguments, plus:
+        partial_callback (callable, optional): Called with the list of opportunities found in each sport
+            as soon as that sport has been processed.
     
-    # Filter out any message objects
-    data = filter(lambda x: isinstance(x, dict) and "message" not in x, data)
+    Returns:
+        list: List of arbitrage opportunities that meet the criteria, or an empty list if cancelled
+    """
+    opportunities = []
+    sport_opportunities = []
     
-    # Process the data with our cutoff incorporated directly
-    arbitrage_opportunities = process_data(data, cutoff=cutoff)
+    def sport_finished(completed, total):
+        if partial_callback is not None and sport_opportunities:
+            partial_callback(list(sport_opportunities))
+        opportunities.extend(sport_opportunities)
+        sport_opportunities.clear()
+        if progress_callback is not None:
+            progress_callback(completed, total)
     
-    # Convert to list for immediate results
-    return list(arbitrage_opportunities)
\ No newline at end of file
+    # Opportunities are grouped per sport; sport_finished runs after each sport's last one is yielded
+    for opportunity in iter_arbitrage_opportunities(key, region, cutoff, selected_sports,
+                                                    progress_callback=sport_finished, cancel_event=cancel_event):
+        sport_opportunities.append(opportunity)
+    
+    if cancel_event is not None and cancel_event.is_set():
+        return []
+    return opportunities